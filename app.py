@@ -1,14 +1,14 @@
 import os
 import random
 import datetime as dt
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Sequence
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import gspread
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.oauth2.credentials import Credentials as UserCredentials
+from google.auth.exceptions import RefreshError
+from requests.adapters import HTTPAdapter, Retry
 
 # ---------------------------
 # CONFIG
@@ -41,73 +41,245 @@ CATEGORIES_ORDERED = [
     "Clothing/Personal",
     "Subscriptions/Misc",
 ]
+CATEGORY_DTYPE = pd.CategoricalDtype(CATEGORIES_ORDERED, ordered=True)
+
+WORKSHEET_HEADERS = {
+    "Budgets": ["Category", "Check1", "Check2", "Check3", "Check4"],
+    "Daily_Spending": ["Date", "Category", "Amount", "Memo"],
+    "Dashboard_Data": ["Key", "Value"],
+}
+# Worksheets whose columns the app owns are read through a bounded range.
+WORKSHEET_RANGES = {
+    "Daily_Spending": "A:D",
+}
+PENDING_FLUSH_SIZE = 5
 
 # ---------------------------
 # GOOGLE AUTH
 # ---------------------------
+@st.cache_resource
 def get_gspread_client() -> gspread.client.Client:
-    """Authenticate user interactively via OAuth."""
+    """Authenticate user interactively via OAuth; one client per process."""
     if os.path.exists("token.json"):
+        from google.oauth2.credentials import Credentials as UserCredentials
         creds = UserCredentials.from_authorized_user_file("token.json", SCOPES)
     else:
+        from google_auth_oauthlib.flow import InstalledAppFlow
         flow = InstalledAppFlow.from_client_secrets_file("client_secret.json", SCOPES)
         creds = flow.run_local_server(port=0)
         with open("token.json", "w") as token:
             token.write(creds.to_json())
-    return gspread.authorize(creds)
+    client = gspread.authorize(creds)
+    # One keep-alive pool shared by every Sheets call, with retries on transient failures.
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=Retry(total=3, backoff_factor=0.3))
+    client.http_client.session.mount("https://", adapter)
+    return client
+
+def _reset_auth() -> None:
+    """Drop the cached client and the worksheet handles bound to it."""
+    get_gspread_client.clear()
+    get_worksheets.clear()
+
+def open_or_create_worksheets(sh, headers_by_title: Dict[str, List[str]]):
+    """Open the titled worksheets, creating any missing ones and their headers in one batch."""
+    existing = {ws.title: ws for ws in sh.worksheets()}
+    missing = [title for title in headers_by_title if title not in existing]
+    if missing:
+        sh.batch_update({"requests": [
+            {"addSheet": {"properties": {"title": title, "gridProperties": {"rowCount": 1000, "columnCount": 50}}}}
+            for title in missing
+        ]})
+        header_rows = [
+            {"range": f"'{title}'!A1", "values": [headers_by_title[title]]}
+            for title in missing if headers_by_title[title]
+        ]
+        if header_rows:
+            sh.values_batch_update({"valueInputOption": "RAW", "data": header_rows})
+        existing = {ws.title: ws for ws in sh.worksheets()}
+    return {title: existing[title] for title in headers_by_title}
+
+@st.cache_resource(ttl=3600)
+def get_worksheets(_client, sheet_id: str):
+    """Open the spreadsheet once and keep the three worksheet handles around."""
+    sh = _client.open_by_key(sheet_id)
+    worksheets = open_or_create_worksheets(sh, WORKSHEET_HEADERS)
+    return worksheets["Budgets"], worksheets["Daily_Spending"], worksheets["Dashboard_Data"]
 
-def open_or_create_worksheet(sh, title: str, headers: List[str] = None):
+def sheet_revision(client, sheet_id: str, last: str = "") -> str:
+    """Drive modifiedTime of the spreadsheet; changes whenever any tab is edited.
+
+    Falls back to "" (TTL-only cache invalidation) when the Drive API is disabled or
+    the file isn't visible to Drive (403/404); on any other API error keeps `last`.
+    """
     try:
-        ws = sh.worksheet(title)
-    except gspread.exceptions.WorksheetNotFound:
-        ws = sh.add_worksheet(title=title, rows=1000, cols=50)
-        if headers:
-            ws.update("A1", [headers])
-    return ws
-
-def df_from_ws(ws):
-    vals = ws.get_all_values()
-    if not vals:
+        return client.http_client.get_file_drive_metadata(sheet_id)["modifiedTime"]
+    except gspread.exceptions.APIError as e:
+        if e.response.status_code in (403, 404):
+            return ""
+        return last
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_values(_ws, sheet_id: str, title: str, revision: str) -> List[List[str]]:
+    """Raw cell values for a worksheet, cached per (sheet_id, title, revision)."""
+    return _ws.get_all_values(WORKSHEET_RANGES.get(title))
+
+def _ws_values(ws) -> List[List[str]]:
+    return _fetch_values(ws, ws.spreadsheet_id, ws.title, st.session_state.get("sheet_revision", ""))
+
+def _invalidate_ws(ws) -> None:
+    _fetch_values.clear(ws, ws.spreadsheet_id, ws.title, st.session_state.get("sheet_revision", ""))
+
+def prefetch_worksheets(worksheets) -> None:
+    """Warm the _fetch_values cache for several worksheets concurrently.
+
+    Only worth calling when the revision has changed; on a warm cache it just unpickles values.
+    """
+    revision = st.session_state.get("sheet_revision", "")
+    with ThreadPoolExecutor(max_workers=len(worksheets)) as ex:
+        list(ex.map(lambda ws: _fetch_values(ws, ws.spreadsheet_id, ws.title, revision), worksheets))
+
+def df_from_values(
+    vals: List[List[str]],
+    numeric_cols: Sequence[str] = (),
+    date_cols: Sequence[str] = (),
+    category_cols: Sequence[str] = (),
+):
+    # An empty worksheet comes back as [[]], not [].
+    if not vals or not vals[0]:
         return pd.DataFrame()
-    return pd.DataFrame(vals[1:], columns=vals[0])
+    df = pd.DataFrame(vals[1:], columns=vals[0])
+    numeric_cols = [col for col in numeric_cols if col in df.columns]
+    date_cols = [col for col in date_cols if col in df.columns]
+    category_cols = [col for col in category_cols if col in df.columns]
+    for col in numeric_cols:
+        df[col] = _to_float_series(df[col])
+    for col in date_cols:
+        df[col] = _to_datetime_series(df[col])
+    for col in category_cols:
+        df[col] = df[col].astype(_category_dtype(df[col]))
+    return df
+
+def _to_datetime_series(s: pd.Series) -> pd.Series:
+    """Parse ISO dates on the fast path; re-parse the rest (e.g. 10/15/2026 typed in Sheets) per element."""
+    parsed = pd.to_datetime(s, format="ISO8601", errors="coerce")
+    retry = parsed.isna() & s.astype(str).str.strip().ne("")
+    if retry.any():
+        parsed[retry] = pd.to_datetime(s[retry], format="mixed", errors="coerce")
+    return parsed
+
+def _category_dtype(s: pd.Series) -> pd.CategoricalDtype:
+    """CATEGORY_DTYPE, extended with any categories the sheet uses beyond the standard list."""
+    extra = sorted(set(s.unique()) - set(CATEGORIES_ORDERED))
+    if not extra:
+        return CATEGORY_DTYPE
+    return pd.CategoricalDtype(CATEGORIES_ORDERED + extra, ordered=True)
+
+def load_ledger(ws_daily):
+    """Typed Daily_Spending frame sorted by Date, re-parsed only when the sheet's rows change."""
+    vals = _ws_values(ws_daily)
+    sig = hash(tuple(map(tuple, vals)))
+    if st.session_state.get("daily_sig") != sig:
+        df = df_from_values(vals, numeric_cols=["Amount"], date_cols=["Date"], category_cols=["Category"])
+        if not df.empty and "Date" in df.columns:
+            df = df.sort_values("Date", kind="stable", na_position="first").reset_index(drop=True)
+        st.session_state["daily_parsed"] = df
+        st.session_state["daily_sig"] = sig
+    return st.session_state["daily_parsed"]
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_budgets(_ws, sheet_id: str, revision: str) -> pd.DataFrame:
+    """Typed Budgets frame, cached per (sheet_id, revision)."""
+    vals = _fetch_values(_ws, sheet_id, _ws.title, revision)
+    return df_from_values(vals, category_cols=["Category"])
+
+def load_budgets(ws_budgets) -> pd.DataFrame:
+    return _load_budgets(ws_budgets, ws_budgets.spreadsheet_id, st.session_state.get("sheet_revision", ""))
+
+def load_dashboard_settings(ws_dash) -> Dict[str, str]:
+    """Dashboard_Data as a Key -> Value dict, built from the cached worksheet values."""
+    vals = _ws_values(ws_dash)
+    return {row[0]: row[1] for row in vals[1:] if len(row) >= 2}
+
+def _as_sheet_text(value: str) -> str:
+    """Prefix free text with ' so USER_ENTERED stores it verbatim, never as a formula, number or date."""
+    return "'" + value if value else value
+
+def pending_txns(ws_daily) -> List[list]:
+    """This session's unsaved transactions for the ledger's own spreadsheet."""
+    return st.session_state.setdefault("pending_txns", {}).setdefault(ws_daily.spreadsheet_id, [])
+
+def flush_pending_txns(ws_daily) -> bool:
+    """Write the ledger's buffered transactions with a single append_rows call.
+
+    On an API error the rows stay queued and an error is shown; returns whether anything was written.
+    """
+    pending = pending_txns(ws_daily)
+    if not pending:
+        return False
+    # Date and Amount stay USER_ENTERED so Sheets types them; Category and Memo are free text.
+    rows = [[date, _as_sheet_text(category), amount, _as_sheet_text(memo)] for date, category, amount, memo in pending]
+    try:
+        ws_daily.append_rows(
+            rows,
+            value_input_option="USER_ENTERED",
+            insert_data_option="INSERT_ROWS",
+            table_range="A1",
+        )
+    except gspread.exceptions.APIError as e:
+        st.error(f"Couldn't save {len(pending)} queued transactions to Google Sheets; they are still queued. ({e})")
+        return False
+    pending.clear()
+    _invalidate_ws(ws_daily)
+    return True
+
+_CURRENCY_TABLE = str.maketrans("", "", "$,\u00a0 ")
 
 def to_float(x):
+    s = str(x).translate(_CURRENCY_TABLE)
     try:
-        return float(str(x).replace("$", "").replace(",", ""))
-    except:
+        return float(s) if s else 0.0
+    except ValueError:
         return 0.0
 
+def _to_float_series(s: pd.Series) -> pd.Series:
+    """Vectorized to_float: strip $, commas and whitespace, coerce, default 0.0."""
+    return pd.to_numeric(s.astype(str).str.replace(r"[$,\s]", "", regex=True), errors="coerce").fillna(0.0).astype(float)
+
 # ---------------------------
 # UI HELPERS
 # ---------------------------
 def verse_header():
-    ref, text = random.choice(SCRIPTURE)
+    if "verse" not in st.session_state:
+        st.session_state["verse"] = random.choice(SCRIPTURE)
+    ref, text = st.session_state["verse"]
     st.markdown(f"### “{text}”  \n*— {ref}*")
+    st.button("New verse", on_click=st.session_state.pop, args=("verse",))
 
 def dashboard_view(ws_budgets, ws_daily, ws_dash):
     st.markdown("## 📈 Dashboard Overview")
     verse_header()
 
-    dash_df = df_from_ws(ws_dash)
-    if dash_df.empty:
+    settings = load_dashboard_settings(ws_dash)
+    if not settings:
         st.info("No dashboard data found yet.")
         return
 
-    monthly_income = to_float(dash_df.loc[dash_df["Key"] == "Monthly_Income", "Value"].values[0])
-    rental_monthly = to_float(dash_df.loc[dash_df["Key"] == "Rental_Monthly", "Value"].values[0])
-    mode = dash_df.loc[dash_df["Key"] == "Mode", "Value"].values[0]
+    monthly_income = to_float(settings.get("Monthly_Income", 0))
+    rental_monthly = to_float(settings.get("Rental_Monthly", 0))
+    mode = settings.get("Mode", "")
 
     st.metric("Monthly Income", f"${monthly_income:,.0f}")
     st.metric("Rental (Vacancy)", f"${rental_monthly:,.0f}")
 
 def budgets_view(ws_budgets):
     st.markdown("## 📋 Budgets")
-    df = df_from_ws(ws_budgets)
+    df = load_budgets(ws_budgets)
     if df.empty:
         st.warning("No budgets yet.")
     else:
         st.dataframe(df, use_container_width=True)
 
+@st.fragment
 def daily_view(ws_daily):
     st.markdown("## 🧾 Daily Spending")
 
@@ -117,12 +289,33 @@ def daily_view(ws_daily):
         amount = st.number_input("Amount", min_value=0.0, step=1.0)
         memo = st.text_input("Memo (optional)")
         if st.form_submit_button("Add"):
-            ws_daily.append_row([str(date), category, amount, memo])
-            st.success("Transaction added.")
+            queued = pending_txns(ws_daily)
+            queued.append([str(date), category, amount, memo])
+            if len(queued) >= PENDING_FLUSH_SIZE:
+                saved = len(queued)
+                if flush_pending_txns(ws_daily):
+                    st.success(f"Saved {saved} transactions to Google Sheets.")
+
+    pending = pending_txns(ws_daily)
+    if pending:
+        st.warning(
+            f"Queued — {len(pending)} not yet saved to Google Sheets. "
+            f"They are saved automatically once {PENDING_FLUSH_SIZE} are queued. "
+            "Until then they live only in this browser session and are lost if you close the tab."
+        )
+        st.button("Save now", key="flush_txns", on_click=flush_pending_txns, args=(ws_daily,))
 
-    df = df_from_ws(ws_daily)
+    df = load_ledger(ws_daily)
+    if pending:
+        # Show unsaved rows straight away instead of waiting for the write.
+        pending_df = df_from_values([WORKSHEET_HEADERS["Daily_Spending"]] + pending, numeric_cols=["Amount"], date_cols=["Date"])
+        df = pd.concat([df, pending_df], ignore_index=True).sort_values("Date", kind="stable", na_position="first")
     if not df.empty:
-        st.dataframe(df.sort_values("Date", ascending=False), use_container_width=True)
+        st.dataframe(
+            df.iloc[::-1],
+            use_container_width=True,
+            column_config={"Date": st.column_config.DateColumn("Date")},
+        )
     else:
         st.info("No transactions logged yet.")
 
@@ -139,18 +332,28 @@ def main():
 
     st.write("Authenticate with Google — this will open a sign-in window.")
     if st.button("Authenticate"):
-        st.session_state["client"] = get_gspread_client()
+        # Rebuild the shared client so a replaced token.json or revoked grant is picked up.
+        _reset_auth()
+        st.session_state["authenticated"] = True
 
-    if "client" not in st.session_state:
+    if not st.session_state.get("authenticated"):
         st.info("Click 'Authenticate' to connect to Google Sheets.")
         return
 
-    client = st.session_state["client"]
-    sh = client.open_by_key(sheet_id)
-
-    ws_budgets = open_or_create_worksheet(sh, "Budgets", ["Category", "Check1", "Check2", "Check3", "Check4"])
-    ws_daily = open_or_create_worksheet(sh, "Daily_Spending", ["Date", "Category", "Amount", "Memo"])
-    ws_dash = open_or_create_worksheet(sh, "Dashboard_Data", ["Key", "Value"])
+    try:
+        client = get_gspread_client()
+        ws_budgets, ws_daily, ws_dash = get_worksheets(client, sheet_id)
+        revision = sheet_revision(client, sheet_id, st.session_state.get("sheet_revision", ""))
+    except RefreshError:
+        _reset_auth()
+        st.session_state.pop("authenticated", None)
+        st.error("Your Google sign-in has expired or was revoked. Click 'Authenticate' to sign in again.")
+        return
+    cold = st.session_state.get("sheet_revision") != revision
+    st.session_state["sheet_revision"] = revision
+    flush_pending_txns(ws_daily)
+    if cold:
+        prefetch_worksheets([ws_budgets, ws_daily, ws_dash])
 
     tab1, tab2, tab3 = st.tabs(["📈 Dashboard", "📋 Budgets", "🧾 Daily Spending"])
     with tab1: